@@ -8,12 +8,22 @@ import json
 import logging
 import os
 import re
+import select
+import signal
+import socket
+import subprocess
+import sys
+import threading
 import uuid
-from argparse import ArgumentParser
+from argparse import ArgumentParser, BooleanOptionalAction
 from dataclasses import dataclass
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
+import scoring
 from scoring import get_interests, get_score
+from snapshot import InterestsSnapshot
+import tracing
+from store import Store
 
 SALT = "Otus"
 ADMIN_LOGIN = "admin"
@@ -24,12 +34,14 @@ FORBIDDEN = 403
 NOT_FOUND = 404
 INVALID_REQUEST = 422
 INTERNAL_ERROR = 500
+SERVICE_UNAVAILABLE = 503
 ERRORS = {
     BAD_REQUEST: "Bad Request",
     FORBIDDEN: "Forbidden",
     NOT_FOUND: "Not Found",
     INVALID_REQUEST: "Invalid Request",
     INTERNAL_ERROR: "Internal Server Error",
+    SERVICE_UNAVAILABLE: "Service Unavailable",
 }
 UNKNOWN = 0
 MALE = 1
@@ -39,6 +51,9 @@ GENDERS = {
     MALE: "male",
     FEMALE: "female",
 }
+LISTEN_FD_ENV = "API_LISTEN_FD"
+READY_FD_ENV = "API_READY_FD"
+HANDOVER_TIMEOUT = 30.0
 
 
 class MyMeta(type):
@@ -155,6 +170,17 @@ class ClientIDsField(metaclass=MyMeta):
         self.val = dct
 
 
+class LimitField(metaclass=MyMeta):
+    def __init__(self, val, required, nullable, dct=None):
+        if dct is not None and (
+            not isinstance(dct, int) or isinstance(dct, bool) or dct <= 0
+        ):
+            raise ValueError(
+                get_error_response("Поле limit должно быть положительным числом")
+            )
+        self.val = dct
+
+
 class ClientsInterestsRequest(object):
     def __init__(self, args):
         self.client_ids = ClientIDsField(
@@ -165,6 +191,13 @@ class ClientsInterestsRequest(object):
         ).val
 
 
+class HotKeysRequest(object):
+    def __init__(self, args):
+        self.limit = LimitField(
+            required=False, nullable=True, val="limit", dct=args.get("limit")
+        ).val
+
+
 class OnlineScoreRequest(object):
     def __init__(self, request):
         args = request.get("body").get("arguments")
@@ -265,6 +298,7 @@ def date_format_validate(date) -> datetime.datetime:
     return datetime.datetime.strptime(str(date), "%d.%m.%Y")
 
 
+@tracing.traced("check_auth")
 def check_auth(request):
     if request.is_admin:
         digest = hashlib.sha512(
@@ -281,6 +315,8 @@ def check_method_request(body):
     if not body.get("body").get("method") in [
         "online_score",
         "clients_interests",
+        "hot_keys",
+        "batch_stats",
     ]:
         return get_error_response("Метода не существует"), INVALID_REQUEST
     return "", OK
@@ -296,7 +332,8 @@ def get_filled_fields(obj: object) -> list:
 
 def method_handler(request, ctx, store):
     try:
-        method_request = MethodRequest(request)
+        with tracing.span("MethodRequest"):
+            method_request = MethodRequest(request)
     except ValueError as e:
         v1 = list(e.args[0].values())[0]
         v2 = list(e.args[0].keys())[0]
@@ -329,19 +366,44 @@ def method_handler(request, ctx, store):
                 return e.args[0], INVALID_REQUEST
             ctx["nclients"] = len(client_inter.client_ids)
             return get_interests(store=store, cid=client_inter.client_ids), OK
+        case "hot_keys":
+            if not method_request.is_admin:
+                return ERRORS.get(FORBIDDEN), FORBIDDEN
+            try:
+                hot_keys = HotKeysRequest(dict(request.get("body").get("arguments")))
+            except Exception as e:
+                return e.args[0], INVALID_REQUEST
+            return store.hot_keys.top(hot_keys.limit or 10), OK
+        case "batch_stats":
+            if not method_request.is_admin:
+                return ERRORS.get(FORBIDDEN), FORBIDDEN
+            return store.batcher.stats(), OK
     return "", OK
 
 
+def readiness_handler(store):
+    state = store.state if store else Store.DISABLED
+    ready = state in (Store.CONNECTED, Store.DISABLED)
+    return {"ready": ready, "store": state}, OK if ready else SERVICE_UNAVAILABLE
+
+
 class MainHTTPHandler(BaseHTTPRequestHandler):
     router = {"method": method_handler}
+    get_router = {"ready": readiness_handler}
     store = None
 
     def get_request_id(self, headers):
-        return headers.get("HTTP_X_REQUEST_ID", uuid.uuid4().hex)
+        return headers.get("X-Request-ID", uuid.uuid4().hex)
 
     def do_POST(self):
+        parent = tracing.parse_traceparent(self.headers.get("traceparent"))
+        with tracing.span(f"POST {self.path}", parent=parent) as span:
+            self.handle_post(span)
+
+    def handle_post(self, span):
         response, code = {}, OK
         context = {"request_id": self.get_request_id(self.headers)}
+        span.set_attribute("request_id", context["request_id"])
         request = None
         try:
             data_string = self.rfile.read(int(self.headers["Content-Length"]))
@@ -363,8 +425,11 @@ class MainHTTPHandler(BaseHTTPRequestHandler):
             else:
                 code = NOT_FOUND
 
+        span.set_attribute("code", code)
         self.send_response(code)
         self.send_header("Content-Type", "application/json")
+        if span.context is not None:
+            self.send_header("traceparent", tracing.format_traceparent(span.context))
         self.end_headers()
         if code not in ERRORS:
             r = {"response": response, "code": code}
@@ -375,11 +440,141 @@ class MainHTTPHandler(BaseHTTPRequestHandler):
         self.wfile.write(json.dumps(r).encode("utf-8"))
         return
 
+    def do_GET(self):
+        path = self.path.strip("/")
+        if path in self.get_router:
+            response, code = self.get_router[path](self.store)
+            r = {"response": response, "code": code}
+        else:
+            code = NOT_FOUND
+            r = {"error": ERRORS.get(code), "code": code}
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(r).encode("utf-8"))
+
+
+class GracefulHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler, listen_fd=None):
+        self.in_flight = 0
+        self.idle = threading.Condition()
+        if listen_fd is None:
+            super().__init__(server_address, handler)
+            return
+        # Reuse the listening socket inherited from the previous process
+        super().__init__(server_address, handler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = socket.socket(fileno=listen_fd)
+        self.server_address = self.socket.getsockname()
+
+    def process_request(self, request, client_address):
+        with self.idle:
+            self.in_flight += 1
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self.idle:
+                self.in_flight -= 1
+                self.idle.notify_all()
+
+    def drain(self, timeout):
+        with self.idle:
+            return self.idle.wait_for(lambda: self.in_flight == 0, timeout)
+
+
+def spawn(server, timeout=HANDOVER_TIMEOUT):
+    """Start a new server process on the same listening socket.
+
+    Returns True once the new process is accepting connections.
+    """
+    fd = server.socket.fileno()
+    ready_r, ready_w = os.pipe()
+    env = dict(os.environ, **{LISTEN_FD_ENV: str(fd), READY_FD_ENV: str(ready_w)})
+    child = subprocess.Popen(
+        [sys.executable] + sys.argv, env=env, pass_fds=(fd, ready_w)
+    )
+    os.close(ready_w)
+    try:
+        readable, _, _ = select.select([ready_r], [], [], timeout)
+        ready = bool(readable) and os.read(ready_r, 1) == b"1"
+    finally:
+        os.close(ready_r)
+    if ready:
+        logging.info("Server process %s took over" % child.pid)
+    else:
+        logging.error("Server process %s did not start, keep serving" % child.pid)
+        child.kill()
+    return ready
+
+
+def serve(server, store, drain_timeout, cache_snapshot=None, ready_fd=None):
+    state = {"reloading": False, "handed_over": False}
+
+    def stop(signum, frame):
+        logging.info("Received signal %s, shutting down" % signum)
+        threading.Thread(target=server.shutdown).start()
+
+    def reload(signum, frame):
+        logging.info("Received signal %s, reloading" % signum)
+        if not state["reloading"]:
+            state["reloading"] = True
+            threading.Thread(target=handover, daemon=True).start()
+
+    def handover():
+        # Save the cache first, so that the new process can load it on start
+        if cache_snapshot:
+            store.save_cache(cache_snapshot)
+        if spawn(server):
+            state["handed_over"] = True
+            server.shutdown()
+        state["reloading"] = False
+
+    signal.signal(signal.SIGTERM, stop)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, reload)
+
+    if cache_snapshot:
+        store.load_cache(cache_snapshot)
+    if ready_fd is not None:
+        # Tell the previous process that it can stop accepting
+        os.write(ready_fd, b"1")
+        os.close(ready_fd)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    if not server.drain(drain_timeout):
+        logging.error("%s requests still in flight after %ss" % (server.in_flight, drain_timeout))
+    if cache_snapshot and not state["handed_over"]:
+        store.save_cache(cache_snapshot)
+    tracing.shutdown()
+    store.close()
+    server.server_close()
+
 
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("-p", "--port", action="store", type=int, default=8080)
     parser.add_argument("-l", "--log", action="store", default=None)
+    parser.add_argument("--drain-timeout", action="store", type=float, default=10.0)
+    parser.add_argument("--cache-snapshot", action="store", default=None)
+    parser.add_argument("--batch-window-ms", action="store", type=float, default=2.0)
+    parser.add_argument("--batch-max-keys", action="store", type=int, default=100)
+    parser.add_argument("--interests-snapshot", action="store", default=None)
+    parser.add_argument(
+        "--legacy-score-keys", action=BooleanOptionalAction, default=True
+    )
+    parser.add_argument("--trace-exporter", action="store", choices=["file", "otlp"], default=None)
+    parser.add_argument("--trace-target", action="store", default=None)
+    parser.add_argument("--trace-sample-rate", action="store", type=float, default=1.0)
     args = parser.parse_args()
 
     if args.log:
@@ -391,10 +586,38 @@ if __name__ == "__main__":
         format="[%(asctime)s] %(levelname).1s %(message)s",
         datefmt="%Y.%m.%d %H:%M:%S",
     )
-    server = HTTPServer(("localhost", args.port), MainHTTPHandler)
+    if args.trace_exporter == "file":
+        tracing.configure(
+            tracing.FileExporter(args.trace_target or "spans.jsonl"),
+            args.trace_sample_rate,
+        )
+    elif args.trace_exporter == "otlp":
+        tracing.configure(
+            tracing.OTLPExporter(args.trace_target or "http://localhost:4318/v1/traces"),
+            args.trace_sample_rate,
+        )
+    scoring.WRITE_LEGACY_SCORE_KEYS = args.legacy_score_keys
+    listen_fd = os.environ.pop(LISTEN_FD_ENV, None)
+    ready_fd = os.environ.pop(READY_FD_ENV, None)
+    server = GracefulHTTPServer(
+        ("localhost", args.port),
+        MainHTTPHandler,
+        listen_fd=int(listen_fd) if listen_fd else None,
+    )
+    MainHTTPHandler.store = Store(
+        test=False,
+        batch_window=args.batch_window_ms / 1000,
+        batch_max_keys=args.batch_max_keys,
+    )
+    if args.interests_snapshot:
+        MainHTTPHandler.store.interests_snapshot = InterestsSnapshot(
+            args.interests_snapshot
+        )
     logging.info("Starting server at %s" % args.port)
-    try:
-        server.serve_forever()
-    except KeyboardInterrupt:
-        pass
-    server.server_close()
+    serve(
+        server,
+        MainHTTPHandler.store,
+        args.drain_timeout,
+        args.cache_snapshot,
+        ready_fd=int(ready_fd) if ready_fd else None,
+    )
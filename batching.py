@@ -0,0 +1,88 @@
+import threading
+
+BATCH_WINDOW = 0.002
+BATCH_MAX_KEYS = 100
+
+
+class Batch:
+    def __init__(self):
+        self.keys: dict = {}
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results: dict = {}
+        self.error = None
+
+
+class MGetBatcher:
+    """Coalesces concurrent key lookups into one MGET.
+
+    The first caller opens a batch and waits up to `window` seconds (or until
+    `max_keys` keys are collected) for other callers to join, then fetches the
+    union of the keys and hands every caller its values.
+    """
+
+    def __init__(self, fetch, window: float = BATCH_WINDOW, max_keys: int = BATCH_MAX_KEYS):
+        self.fetch = fetch
+        self.window = window
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.batch = None
+        self.calls = 0
+        self.keys_requested = 0
+        self.keys_fetched = 0
+        self.batches = 0
+
+    def get_many(self, keys: list) -> list:
+        if not keys:
+            return []
+        with self.lock:
+            self.calls += 1
+            self.keys_requested += len(keys)
+            if self.window <= 0:
+                self.batches += 1
+                self.keys_fetched += len(set(keys))
+                batch = None
+            else:
+                batch = self.batch
+                leader = batch is None
+                if leader:
+                    batch = self.batch = Batch()
+                batch.keys.update(dict.fromkeys(keys))
+                if len(batch.keys) >= self.max_keys:
+                    self.close(batch)
+        if batch is None:
+            return self.fetch(keys)
+
+        if leader:
+            batch.full.wait(self.window)
+            with self.lock:
+                self.close(batch)
+                self.batches += 1
+                self.keys_fetched += len(batch.keys)
+            try:
+                batch.results = dict(zip(batch.keys, self.fetch(list(batch.keys))))
+            except Exception as e:
+                batch.error = e
+            batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return [batch.results[key] for key in keys]
+
+    def close(self, batch):
+        if self.batch is batch:
+            self.batch = None
+        batch.full.set()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "batches": self.batches,
+                "keys_requested": self.keys_requested,
+                "keys_fetched": self.keys_fetched,
+                "calls_per_batch": self.calls / self.batches if self.batches else 0.0,
+                "keys_saved": self.keys_requested - self.keys_fetched,
+            }
@@ -0,0 +1,39 @@
+import os
+import sys
+import timeit
+from argparse import ArgumentParser
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring import legacy_score_key, score_key  # noqa: E402
+
+ARGUMENTS = {
+    "phone": "79175002040",
+    "email": "stupnikov@otus.ru",
+    "birthday": datetime(2000, 1, 1),
+    "gender": 1,
+    "first_name": "a",
+    "last_name": "b",
+}
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("-n", "--number", action="store", type=int, default=100000)
+    args = parser.parse_args()
+
+    legacy_arguments = {
+        k: v for k, v in ARGUMENTS.items() if k not in ("email", "gender")
+    }
+    for name, func, kwargs in (
+        ("legacy_score_key", legacy_score_key, legacy_arguments),
+        ("score_key", score_key, ARGUMENTS),
+    ):
+        best = min(timeit.repeat(lambda: func(**kwargs), number=args.number, repeat=5))
+        print(f"{name:<20} {best / args.number * 1e9:8.0f} ns/key "
+              f"({len(func(**kwargs))} chars)")
+
+
+if __name__ == "__main__":
+    main()
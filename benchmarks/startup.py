@@ -0,0 +1,50 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in microseconds of every top-level import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            if len(indent) <= 3:
+                times[name] = int(cumulative)
+    return times
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("-m", "--module", action="store", default="api")
+    parser.add_argument("-n", "--runs", action="store", type=int, default=10)
+    parser.add_argument("-t", "--top", action="store", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    medians = {
+        name: statistics.median(run.get(name, 0) for run in runs)
+        for name in runs[-1]
+    }
+    print(f"import {args.module}: {medians.get(args.module, 0) / 1000:.1f} ms "
+          f"(median of {args.runs} runs)")
+    for name, us in sorted(medians.items(), key=lambda i: -i[1])[:args.top]:
+        print(f"  {name:<30} {us / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import threading
+
+HOT_KEYS_CAPACITY = 100
+HOT_KEY_SHARE = 0.01
+HOT_KEY_MIN_COUNT = 100
+HOT_KEYS_DECAY_EVERY = 10000
+HOT_KEY_TTL = 4 * 60 * 60
+# Interests can change in Redis at any time, so they are pinned only briefly
+HOT_INTERESTS_TTL = 30
+
+
+class HotKeys:
+    """Space-saving top-K tracker of the most requested keys.
+
+    At most `capacity` keys are counted. A new key replaces the least counted
+    one and inherits its count, which is remembered as the overestimation error.
+    Keys are grouped in buckets by count (a stream-summary), so every update
+    is O(1). Every `decay_every` lookups all counts and the total are halved,
+    so the tracker follows the current traffic rather than all of it.
+    """
+
+    def __init__(
+            self,
+            capacity: int = HOT_KEYS_CAPACITY,
+            share: float = HOT_KEY_SHARE,
+            min_count: int = HOT_KEY_MIN_COUNT,
+            decay_every: int = HOT_KEYS_DECAY_EVERY
+    ):
+        self.capacity = capacity
+        self.share = share
+        self.min_count = min_count
+        self.decay_every = decay_every
+        self.since_decay = 0
+        self.total = 0
+        self.counts: dict = {}
+        self.errors: dict = {}
+        # count -> keys with that count, oldest first
+        self.buckets: dict = {}
+        self.min_bucket = 0
+        self.lock = threading.Lock()
+
+    def add(self, key) -> int:
+        with self.lock:
+            self.total += 1
+            count = self.counts.get(key)
+            if count is not None:
+                self.__unlink(key, count)
+            elif len(self.counts) < self.capacity:
+                count = 0
+                self.errors[key] = 0
+                self.min_bucket = 0
+            else:
+                count = self.min_bucket
+                victim = next(iter(self.buckets[count]))
+                self.__unlink(victim, count)
+                del self.counts[victim]
+                del self.errors[victim]
+                self.errors[key] = count
+            count += 1
+            self.counts[key] = count
+            self.buckets.setdefault(count, {})[key] = None
+            if self.min_bucket not in self.buckets:
+                self.min_bucket = count
+            self.since_decay += 1
+            if self.since_decay >= self.decay_every:
+                self.__decay()
+            return self.counts.get(key, 0)
+
+    def __decay(self):
+        self.since_decay = 0
+        self.total //= 2
+        counts, errors, buckets = {}, {}, {}
+        for key, count in self.counts.items():
+            count //= 2
+            if count:
+                counts[key] = count
+                errors[key] = self.errors[key] // 2
+                buckets.setdefault(count, {})[key] = None
+        self.counts, self.errors, self.buckets = counts, errors, buckets
+        self.min_bucket = min(buckets) if buckets else 0
+
+    def __unlink(self, key, count):
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+
+    def is_hot(self, key) -> bool:
+        count = self.counts.get(key, 0) - self.errors.get(key, 0)
+        return count >= self.min_count and count >= self.share * self.total
+
+    def top(self, limit: int = 10) -> list:
+        with self.lock:
+            items = sorted(self.counts.items(), key=lambda i: -i[1])[:limit]
+            return [
+                {"key": key, "count": count, "error": self.errors[key]}
+                for key, count in items
+            ]
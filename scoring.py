@@ -1,26 +1,70 @@
+import binascii
 import hashlib
 import json
 from datetime import datetime
 from typing import Optional
+from hotkeys import HOT_INTERESTS_TTL
 from store import Store
+import tracing
 
+SCORE_KEY_PREFIX = "s2:"
+# Keep writing "uid:" keys while servers running the old key scheme are
+# deployed, turned off with api.py --no-legacy-score-keys
+WRITE_LEGACY_SCORE_KEYS = True
 
-def get_score(
-        store: Store,
-        phone: Optional[str] = None,
+
+def score_key(
+        phone: Optional[str | int] = None,
         email: Optional[str] = None,
         birthday: Optional[datetime] = None,
         gender: Optional[int] = None,
         first_name: Optional[str] = None,
         last_name: Optional[str] = None
-) -> float:
+) -> str:
+    """Cache key covering every score input.
+
+    Text fields are length-prefixed, so ("ab", "c") and ("a", "bc") differ.
+    """
+    # PhoneField accepts both 79175002040 and "79175002040"
+    phone = "" if phone is None else str(phone)
+    email = email or ""
+    first_name, last_name = first_name or "", last_name or ""
+    data = (
+        f"{len(phone)}:{phone}{len(email)}:{email}"
+        f"{len(first_name)}:{first_name}{len(last_name)}:{last_name}"
+        f"{birthday.toordinal() if birthday else ''}:"
+        f"{'' if gender is None else gender}"
+    )
+    digest = hashlib.blake2b(data.encode("utf-8"), digest_size=16).digest()
+    return SCORE_KEY_PREFIX + binascii.b2a_base64(digest, newline=False)[:22].decode()
+
+
+def legacy_score_key(
+        phone: Optional[str | int] = None,
+        birthday: Optional[datetime] = None,
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None
+) -> str:
     key_parts = [
         first_name or "",
         last_name or "",
-        phone or "",
+        "" if phone is None else str(phone),
         birthday.strftime("%Y%m%d") if birthday else "",
     ]
-    key = "uid:" + hashlib.md5("".join(key_parts).encode('utf-8')).hexdigest()
+    return "uid:" + hashlib.md5("".join(key_parts).encode('utf-8')).hexdigest()
+
+
+@tracing.traced("get_score")
+def get_score(
+        store: Store,
+        phone: Optional[str] = None,
+        email: Optional[str] = None,
+        birthday: Optional[datetime] = None,
+        gender: Optional[int] = None,
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None
+) -> float:
+    key = score_key(phone, email, birthday, gender, first_name, last_name)
 
     # Try to get from cache
     score = store.cache_get(key)
@@ -40,9 +84,24 @@ def get_score(
 
     # Cache the score for 60 minutes
     store.cache_set(key, score, 60 * 60)
+    if WRITE_LEGACY_SCORE_KEYS:
+        store.cache_set(
+            legacy_score_key(phone, birthday, first_name, last_name),
+            score,
+            60 * 60,
+            local=False,
+        )
     return score
 
 
-def get_interests(store: Store, cid: str) -> list:
-    r = store.get(f"i:{cid}")
-    return json.loads(r) if r else []
+@tracing.traced("get_interests")
+def get_interests(store: Store, cid: list) -> dict:
+    snapshot = store.interests_snapshot
+    found = snapshot.get_many(cid) if snapshot else {}
+    missing = [i for i in cid if i not in found]
+    # Per-client lookups are coalesced with other requests into one MGET
+    values = store.cache_get_many(
+        [f"i:{i}" for i in missing], pin_ttl=HOT_INTERESTS_TTL
+    )
+    found.update(zip(missing, values))
+    return {i: json.loads(found[i]) for i in cid if found.get(i)}
@@ -0,0 +1,146 @@
+import bisect
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from argparse import ArgumentParser
+
+MAGIC = b"ISNP"
+VERSION = 1
+# magic, version, number of clients, reserved
+HEADER = struct.Struct("<4sIII")
+RELOAD_INTERVAL = 1.0
+EXPORT_CHUNK = 1000
+
+
+def write_snapshot(path, interests: dict):
+    """Write {client_id: interests json} as an immutable snapshot file.
+
+    Layout (little-endian): header, sorted int64 client ids, uint64 offsets
+    of every client's payload and the packed json payloads themselves.
+    """
+    ids = sorted(interests)
+    payloads = [interests[i].encode("utf-8") for i in ids]
+    offsets = [0]
+    for payload in payloads:
+        offsets.append(offsets[-1] + len(payload))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(ids), 0))
+        f.write(struct.pack(f"<{len(ids)}q", *ids))
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        f.writelines(payloads)
+    # Readers pick up the new file on their next reload check
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < HEADER.size:
+            raise ValueError(f"{path} is truncated")
+        magic, version, count, _ = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an interests snapshot")
+        ids_end = HEADER.size + count * 8
+        offsets_end = ids_end + (count + 1) * 8
+        if len(self.mm) < offsets_end:
+            raise ValueError(f"{path} is truncated")
+        view = memoryview(self.mm)
+        self.ids = view[HEADER.size:ids_end].cast("q")
+        self.offsets = view[ids_end:offsets_end].cast("Q")
+        self.data = view[offsets_end:]
+        if len(self.data) < self.offsets[-1]:
+            raise ValueError(f"{path} is truncated")
+
+    def get(self, cid: int):
+        i = bisect.bisect_left(self.ids, cid)
+        if i == len(self.ids) or self.ids[i] != cid:
+            return None
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class InterestsSnapshot:
+    """Read-only interests served from a memory-mapped snapshot file.
+
+    The file is shared through the page cache by every process that maps it.
+    A new snapshot swapped in with `write_snapshot` is picked up without a
+    restart.
+    """
+
+    def __init__(self, path, reload_interval: float = RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.signature = None
+        self.checked_at = 0.0
+        self.reload()
+
+    def reload(self):
+        self.checked_at = time.monotonic()
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if signature == self.signature:
+            return
+        try:
+            snapshot = Snapshot(self.path)
+        except (OSError, ValueError) as e:
+            logging.error("Failed to load interests snapshot: %s" % e)
+            return
+        # Readers still holding the old snapshot keep their mapping alive
+        self.snapshot, self.signature = snapshot, signature
+        logging.info("Loaded %s clients from %s" % (len(snapshot.ids), self.path))
+
+    def get_many(self, cids: list) -> dict:
+        if time.monotonic() - self.checked_at >= self.reload_interval:
+            with self.lock:
+                if time.monotonic() - self.checked_at >= self.reload_interval:
+                    self.reload()
+        snapshot = self.snapshot
+        if snapshot is None:
+            return {}
+        found = {}
+        for cid in cids:
+            value = snapshot.get(cid)
+            if value is not None:
+                found[cid] = value
+        return found
+
+
+def export(store, path):
+    interests = {}
+    keys = [key for key in store.r.scan_iter(match="i:*", count=EXPORT_CHUNK)
+            if key[2:].isdigit()]
+    for start in range(0, len(keys), EXPORT_CHUNK):
+        chunk = keys[start:start + EXPORT_CHUNK]
+        for key, value in zip(chunk, store.r.mget(chunk)):
+            if value is not None:
+                interests[int(key[2:])] = value
+    write_snapshot(path, interests)
+    return len(interests)
+
+
+def main():
+    from store import Store
+
+    parser = ArgumentParser()
+    parser.add_argument("path", action="store")
+    args = parser.parse_args()
+
+    store = Store(test=False)
+    store.connect_done.wait()
+    if not store.connected:
+        raise SystemExit("Redis is not available")
+    print(f"Exported {export(store, args.path)} clients to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
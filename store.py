@@ -1,9 +1,15 @@
 import json
 import logging
 import os
+import threading
+import time
+from collections import OrderedDict
 
-from dotenv import load_dotenv
-import redis
+from batching import BATCH_MAX_KEYS, BATCH_WINDOW, MGetBatcher
+from hotkeys import HOT_KEY_TTL, HotKeys
+import tracing
+
+LOCAL_CACHE_SIZE = 10000
 
 
 class SingletonStore(type):
@@ -16,22 +22,50 @@ class SingletonStore(type):
 
 
 class Store(metaclass=SingletonStore):
-    load_dotenv()
+    DISABLED = 'disabled'
+    CONNECTING = 'connecting'
+    CONNECTED = 'connected'
+    UNAVAILABLE = 'unavailable'
 
-    def __init__(self, test=True):
+    def __init__(self, test=True, batch_window=BATCH_WINDOW, batch_max_keys=BATCH_MAX_KEYS):
         self.autoconnect_count = 3
-        self.r = redis.Redis(
-            host='redis-16160.c241.us-east-1-4.ec2.redns.redis-cloud.com',
-            port=16160,
-            decode_responses=True,
-            username="default",
-            password=self.__get_pass(),
-            socket_timeout=3
-        )
+        self.local_cache: OrderedDict = OrderedDict()
+        self.local_cache_size = LOCAL_CACHE_SIZE
+        self.cache_lock = threading.Lock()
+        self.hot_keys = HotKeys()
+        self.batcher = MGetBatcher(self.mget, batch_window, batch_max_keys)
+        self.interests_snapshot = None
+        self.connected = False
+        self.connect_done = threading.Event()
+        self._r = None
         if test:
-            self.connected = False
+            self.state = self.DISABLED
+            self.connect_done.set()
             return
-        self.connected = self.__is_connect()
+        # Connect in the background so the server can start serving at once
+        self.state = self.CONNECTING
+        threading.Thread(target=self.connect, daemon=True).start()
+
+    @property
+    def r(self):
+        if self._r is None:
+            # redis is the heaviest import of the app, load it on first use
+            import redis
+
+            self._r = redis.Redis(
+                host='redis-16160.c241.us-east-1-4.ec2.redns.redis-cloud.com',
+                port=16160,
+                decode_responses=True,
+                username="default",
+                password=self.__get_pass(),
+                socket_timeout=3
+            )
+        return self._r
+
+    def connect(self):
+        self.connected = bool(self.__is_connect())
+        self.state = self.CONNECTED if self.connected else self.UNAVAILABLE
+        self.connect_done.set()
 
         if self.connected:
             print('Connected')
@@ -44,54 +78,147 @@ class Store(metaclass=SingletonStore):
         try:
             print('Trying to connect to redis...')
             self.autoconnect_count -= 1
-            c = self.r.ping()
+            with tracing.span("redis PING"):
+                c = self.r.ping()
         except Exception:
             return False if self.autoconnect_count == 0 else self.__is_connect()
 
         return c
 
     def __get_pass(self):
+        from dotenv import load_dotenv
+
+        load_dotenv()
         redis_pass = os.getenv('REDIS_PASSWORD')
         if redis_pass:
             return redis_pass
 
+    def __command(self, default, span, name, *args, **kwargs):
+        if not self.connected and self.state != self.CONNECTING:
+            return default
+        try:
+            with span:
+                return getattr(self.r, name)(*args, **kwargs)
+        except Exception as e:
+            if self.connected:
+                raise
+            # The client connects on its first command, so requests do not
+            # wait for the background ping. Until it succeeds, a failing
+            # command means Redis is not there yet.
+            logging.error('Redis %s failed while connecting: %s' % (name, e))
+            return default
+
     def get(self, key):
-        return None if not self.connected else self.r.get(key)
+        return self.__command(None, tracing.span("redis GET", key=key), 'get', key)
 
     def set(self, key, value):
-        return None if not self.connected else self.r.set(key, value)
+        return self.__command(None, tracing.span("redis SET", key=key), 'set', key, value)
 
-    def cache_get(self, key):
-        return self.get(key)
+    def mget(self, keys):
+        return self.__command(
+            [None] * len(keys), tracing.span("redis MGET", keys=len(keys)), 'mget', keys
+        )
 
-    def cache_set(self, key, score, param):
-        if self.connected:
-            self.r.set(key, score, ex=param)
+    def cache_get(self, key, pin_ttl=HOT_KEY_TTL):
+        self.hot_keys.add(key)
+        value = self.__local_get(key)
+        if value is None:
+            value = self.__pin_hot(key, self.get(key), pin_ttl)
+        return value
+
+    def cache_get_many(self, keys, pin_ttl=HOT_KEY_TTL):
+        values = {}
+        for key in keys:
+            self.hot_keys.add(key)
+            values[key] = self.__local_get(key)
+        missing = [key for key, value in values.items() if value is None]
+        for key, value in zip(missing, self.batcher.get_many(missing)):
+            values[key] = self.__pin_hot(key, value, pin_ttl)
+        return [values[key] for key in keys]
+
+    def __local_get(self, key):
+        with self.cache_lock:
+            cached = self.local_cache.get(key)
+            if cached is None:
+                return None
+            value, expires_at = cached
+            if expires_at > time.time():
+                self.local_cache.move_to_end(key)
+                return value
+            del self.local_cache[key]
+        return None
+
+    def __local_set(self, key, value, expires_at):
+        with self.cache_lock:
+            self.local_cache[key] = (value, expires_at)
+            self.local_cache.move_to_end(key)
+            # Least recently used entries go first, expired or not
+            while len(self.local_cache) > self.local_cache_size:
+                self.local_cache.popitem(last=False)
+
+    def __pin_hot(self, key, value, ttl):
+        if value is not None and self.hot_keys.is_hot(key):
+            # Pin hot keys locally to take load off their Redis node
+            self.__local_set(key, value, time.time() + ttl)
+        return value
+
+    def cache_set(self, key, score, param, local=True):
+        if local:
+            # Only the local copy of a hot key outlives the Redis TTL
+            ttl = max(param, HOT_KEY_TTL) if self.hot_keys.is_hot(key) else param
+            self.__local_set(key, score, time.time() + ttl)
+        self.__command(None, tracing.span("redis SET", key=key), 'set', key, score, ex=param)
+
+    def save_cache(self, path):
+        now = time.time()
+        # Handler threads may still be writing if the drain timed out
+        with self.cache_lock:
+            entries = list(self.local_cache.items())
+        snapshot = {
+            key: [value, expires_at]
+            for key, (value, expires_at) in entries
+            if expires_at > now
+        }
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+        logging.info('Saved %s cache entries to %s' % (len(snapshot), path))
+
+    def load_cache(self, path):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            logging.info('No cache snapshot loaded from %s' % path)
+            return
+        now = time.time()
+        for key, (value, expires_at) in snapshot.items():
+            if expires_at > now:
+                self.__local_set(key, value, expires_at)
+        logging.info('Loaded %s cache entries from %s' % (len(self.local_cache), path))
+
+    def close(self):
+        if self._r is not None:
+            self._r.close()
 
     def set_test_interests(self, key, value):
         return self.r.set(key, value)
 
 
+SEED_INTERESTS = ["cars", "pets", "travel", "hi-tech", "sport", "music", "books"]
+SEED_CLIENT_IDS = [1, 2, 3, 4, 5, 6]
+
+
+def seed_interests(cid):
+    return SEED_INTERESTS[cid - 1:cid + 1]
+
+
 def main():
     store = Store(test=False)
-    test_set1 = [1, 2, 3, 4, 5, 6]
-    request1 = {
-        "account": "horns&hoofs",
-        "login": "h&f",
-        "method": "clients_interests",
-        "arguments": {"client_ids": [1, 2, 3, 4, 5, 6], "date": "20.07.2017"},
-    }
-    test_set2 = [1, 2, 3, 4, 5]
-    request2 = {
-        "account": "horns&hoofs",
-        "login": "h&f",
-        "method": "clients_interests",
-        "arguments": {"client_ids": [1, 2, 3, 4, 5], "date": "20.07.2017"},
-    }
-    s1 = f'i:{test_set1}'
-    s2 = f'i:{test_set2}'
-    print(store.set(s1, json.dumps(test_set1)))
-    print(store.set(s2, json.dumps(test_set2)))
+    store.connect_done.wait()
+    for cid in SEED_CLIENT_IDS:
+        print(store.set(f'i:{cid}', json.dumps(seed_interests(cid))))
 
 
 if __name__ == "__main__":
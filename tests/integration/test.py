@@ -1,10 +1,11 @@
 import datetime
 import functools
 import hashlib
+import json
 import unittest
 
 import api  # предполагается, что api.py содержит метод method_handler
-from store import Store
+from store import SEED_CLIENT_IDS, Store, seed_interests
 
 
 def cases(cases):
@@ -25,6 +26,9 @@ class TestSuite(unittest.TestCase):
         self.context = {}
         self.headers = {}
         self.store = Store(test=False)
+        self.store.connect_done.wait()
+        for cid in SEED_CLIENT_IDS:
+            self.store.set(f"i:{cid}", json.dumps(seed_interests(cid)))
 
     def get_response(self, request):
         return api.method_handler(
@@ -50,9 +54,9 @@ class TestSuite(unittest.TestCase):
 
     @cases(
         [
-            {"client_ids": [1], "date": "20.07.2017"},
-            {"client_ids": [1, 2], "date": "20.07.2017"},
-            {"client_ids": [1, 2, 3], "date": "20.07.2017"},
+            {"client_ids": [1001], "date": "20.07.2017"},
+            {"client_ids": [1001, 1002], "date": "20.07.2017"},
+            {"client_ids": [1001, 1002, 1003], "date": "20.07.2017"},
         ]
     )
     def test_invalid_interests_request(self, arguments):
@@ -83,6 +87,9 @@ class TestSuite(unittest.TestCase):
         response, code = self.get_response(request)
         self.assertEqual(api.OK, code, arguments)
         self.assertEqual(len(arguments["client_ids"]), len(response))
+        self.assertEqual(
+            {cid: seed_interests(cid) for cid in arguments["client_ids"]}, response
+        )
         self.assertEqual(self.context.get("nclients"), len(arguments["client_ids"]))
 
 
@@ -1,10 +1,25 @@
 import datetime
 import functools
 import hashlib
+import http.client
+import json
+import os
+import random
+import signal
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
 
 import api  # предполагается, что api.py содержит метод method_handler
-from store import Store
+from batching import MGetBatcher
+from hotkeys import HOT_INTERESTS_TTL, HotKeys
+import scoring
+from scoring import SCORE_KEY_PREFIX, get_interests, score_key
+from snapshot import InterestsSnapshot, write_snapshot
+import tracing
+from store import LOCAL_CACHE_SIZE, Store
 
 
 def cases(cases):
@@ -93,6 +108,7 @@ class TestSuite(unittest.TestCase):
     @cases(
         [
             {"phone": "79175002040", "email": "stupnikov@otus.ru"},
+            {"phone": 79175002040, "email": "stupnikov@otus.ru"},
             {
                 "gender": 1,
                 "birthday": "01.01.2000",
@@ -179,6 +195,560 @@ class TestSuite(unittest.TestCase):
         response, _ = self.get_response(request)
         self.assertFalse(len(response), 0)
 
+    @cases([{}, {"limit": 1}])
+    def test_ok_hot_keys_request(self, arguments):
+        request = {
+            "account": "horns&hoofs",
+            "login": "admin",
+            "method": "hot_keys",
+            "arguments": arguments,
+        }
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        self.assertEqual(api.OK, code, arguments)
+        self.assertIsInstance(response, list)
+        self.assertLessEqual(len(response), arguments.get("limit", 10))
+
+    @cases(
+        [
+            ("h&f", {}, api.FORBIDDEN),
+            ("admin", {"limit": 0}, api.INVALID_REQUEST),
+            ("admin", {"limit": "10"}, api.INVALID_REQUEST),
+        ]
+    )
+    def test_invalid_hot_keys_request(self, login, arguments, expected_code):
+        request = {
+            "account": "horns&hoofs",
+            "login": login,
+            "method": "hot_keys",
+            "arguments": arguments,
+        }
+        self.set_valid_auth(request)
+        _, code = self.get_response(request)
+        self.assertEqual(expected_code, code, arguments)
+
+    def test_ok_batch_stats_request(self):
+        request = {
+            "account": "horns&hoofs",
+            "login": "admin",
+            "method": "batch_stats",
+            "arguments": {},
+        }
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        self.assertEqual(api.OK, code)
+        self.assertIn("calls_per_batch", response)
+
+
+class BatcherTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.fetched = []
+
+    def fetch(self, keys):
+        self.fetched.append(sorted(keys))
+        return [f"v{key}" for key in keys]
+
+    def get_concurrently(self, batcher, requests):
+        results = [None] * len(requests)
+
+        def get(i):
+            results[i] = batcher.get_many(requests[i])
+
+        threads = [threading.Thread(target=get, args=(i,)) for i in range(len(requests))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_coalesce_concurrent_requests(self):
+        batcher = MGetBatcher(self.fetch, window=0.2, max_keys=100)
+        results = self.get_concurrently(batcher, [["i:1", "i:2"], ["i:2", "i:3"]])
+        self.assertEqual([["vi:1", "vi:2"], ["vi:2", "vi:3"]], results)
+        self.assertEqual([["i:1", "i:2", "i:3"]], self.fetched)
+        stats = batcher.stats()
+        self.assertEqual(1, stats["batches"])
+        self.assertEqual(1, stats["keys_saved"])
+
+    def test_max_keys_closes_batch(self):
+        batcher = MGetBatcher(self.fetch, window=10, max_keys=2)
+        started = time.time()
+        self.assertEqual(["vi:1", "vi:2"], batcher.get_many(["i:1", "i:2"]))
+        self.assertLess(time.time() - started, 1)
+
+    def test_no_window(self):
+        batcher = MGetBatcher(self.fetch, window=0)
+        self.assertEqual(["vi:1"], batcher.get_many(["i:1"]))
+        self.assertEqual([], batcher.get_many([]))
+        self.assertEqual(1, batcher.stats()["batches"])
+
+    def test_fetch_error(self):
+        def fetch(keys):
+            raise ConnectionError("down")
+
+        batcher = MGetBatcher(fetch, window=0.001)
+        with self.assertRaises(ConnectionError):
+            batcher.get_many(["i:1"])
+
+
+class InterestsSnapshotTestSuite(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "interests.snap")
+        write_snapshot(self.path, {3: '["cars"]', 1: '["pets", "отус"]', 7: "[]"})
+
+    def test_lookup(self):
+        snapshot = InterestsSnapshot(self.path)
+        self.assertEqual(
+            {1: '["pets", "отус"]', 3: '["cars"]', 7: "[]"},
+            snapshot.get_many([1, 2, 3, 7, 8]),
+        )
+
+    def test_swap(self):
+        snapshot = InterestsSnapshot(self.path, reload_interval=0)
+        write_snapshot(self.path, {2: '["travel"]'})
+        self.assertEqual({2: '["travel"]'}, snapshot.get_many([1, 2]))
+
+    def truncate(self, size):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        with open(self.path + ".tmp", "wb") as f:
+            f.write(data[:size])
+        os.replace(self.path + ".tmp", self.path)
+
+    @cases([0, 10, 20, 60, 90])
+    def test_truncated_file(self, size):
+        write_snapshot(self.path, {3: '["cars"]', 1: '["pets", "отус"]', 7: "[]"})
+        self.truncate(size)
+        snapshot = InterestsSnapshot(self.path)
+        self.assertEqual({}, snapshot.get_many([1, 3]))
+
+    @cases([10, 20, 30, 44])
+    def test_truncated_swap_keeps_previous(self, size):
+        write_snapshot(self.path, {3: '["cars"]'})
+        snapshot = InterestsSnapshot(self.path, reload_interval=0)
+        self.truncate(size)
+        self.assertEqual({3: '["cars"]'}, snapshot.get_many([3]))
+
+    def test_missing_file(self):
+        snapshot = InterestsSnapshot(self.path + ".missing")
+        self.assertEqual({}, snapshot.get_many([1]))
+
+    def test_redis_fallback(self):
+        store = Store()
+        store.interests_snapshot = InterestsSnapshot(self.path)
+        self.addCleanup(setattr, store, "interests_snapshot", None)
+        store.local_cache["i:2"] = ('["music"]', time.time() + 60)
+        self.addCleanup(store.local_cache.clear)
+        self.assertEqual(
+            {1: ["pets", "отус"], 2: ["music"], 3: ["cars"]},
+            get_interests(store, [1, 2, 3, 4]),
+        )
+
+
+class TracingTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.exporter = tracing.InMemoryExporter()
+        tracing.configure(self.exporter)
+        self.addCleanup(tracing.shutdown)
+
+    @cases(
+        [
+            ("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01", True),
+            ("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00", False),
+        ]
+    )
+    def test_parse_traceparent(self, header, sampled):
+        context = tracing.parse_traceparent(header)
+        self.assertEqual("4bf92f3577b34da6a3ce929d0e0e4736", context.trace_id)
+        self.assertEqual("00f067aa0ba902b7", context.span_id)
+        self.assertEqual(sampled, context.sampled)
+        self.assertEqual(header, tracing.format_traceparent(context))
+
+    @cases(
+        [
+            None,
+            "",
+            "garbage",
+            "00-00000000000000000000000000000000-00f067aa0ba902b7-01",
+            "00-4bf92f3577b34da6a3ce929d0e0e4736-0000000000000000-01",
+        ]
+    )
+    def test_invalid_traceparent(self, header):
+        self.assertIsNone(tracing.parse_traceparent(header))
+
+    def test_nested_spans(self):
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "online_score",
+            "arguments": {"first_name": "a", "last_name": "b"},
+            "token": hashlib.sha512(
+                ("horns&hoofs" + "h&f" + api.SALT).encode("utf-8")
+            ).hexdigest(),
+        }
+        with tracing.span("root"):
+            api.method_handler({"body": request, "headers": {}}, {}, Store())
+        spans = {span["name"]: span for span in self.exporter.spans}
+        self.assertEqual({"MethodRequest", "check_auth", "get_score", "root"}, set(spans))
+        self.assertEqual(1, len({span["trace_id"] for span in spans.values()}))
+        self.assertEqual(spans["MethodRequest"]["span_id"], spans["check_auth"]["parent_id"])
+        self.assertEqual(spans["root"]["span_id"], spans["get_score"]["parent_id"])
+
+    def test_sampling(self):
+        tracing.configure(self.exporter, sample_rate=0)
+        with tracing.span("root"):
+            with tracing.span("child"):
+                pass
+        self.assertEqual([], self.exporter.spans)
+
+    def test_disabled(self):
+        tracing.shutdown()
+        self.assertIs(tracing.NOOP_SPAN, tracing.span("root"))
+
+    def test_otlp_queue_is_bounded(self):
+        exporter = tracing.OTLPExporter("http://localhost:9/v1/traces", flush_interval=60, max_queue=3)
+        with mock.patch.object(exporter, "post") as post:
+            for i in range(5):
+                exporter.export({"name": str(i)})
+            self.assertEqual(3, len(exporter.spans))
+            self.assertEqual(2, exporter.dropped)
+            exporter.shutdown()
+        post.assert_called_once()
+        self.assertEqual([{"name": "0"}, {"name": "1"}, {"name": "2"}], post.call_args.args[0])
+
+    def test_otlp_shutdown_has_one_deadline(self):
+        exporter = tracing.OTLPExporter("http://localhost:9/v1/traces", flush_interval=60)
+        with mock.patch.object(exporter, "post", side_effect=lambda spans, timeout: time.sleep(timeout)) as post:
+            exporter.full.clear()
+            with exporter.lock:
+                exporter.spans = [{"name": str(i)} for i in range(4 * tracing.OTLP_MAX_BATCH)]
+            started = time.monotonic()
+            exporter.shutdown(timeout=0.2)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertLess(post.call_count, 4)
+        self.assertLessEqual(post.call_args_list[0].args[1], 0.2)
+
+    def test_export_after_shutdown_is_ignored(self):
+        otlp = tracing.OTLPExporter("http://localhost:9/v1/traces", flush_interval=60)
+        with mock.patch.object(otlp, "post") as post:
+            otlp.shutdown()
+            otlp.export({"name": "late"})
+        post.assert_not_called()
+        self.assertEqual([], otlp.spans)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            exporter = tracing.FileExporter(os.path.join(tmp, "spans.jsonl"))
+            exporter.shutdown()
+            exporter.export({"name": "late"})
+
+    def test_otlp_full_batch_wakes_flush_thread(self):
+        exporter = tracing.OTLPExporter("http://localhost:9/v1/traces", flush_interval=60)
+        posted = threading.Event()
+        with mock.patch.object(exporter, "post", side_effect=lambda spans, timeout: posted.set()) as post:
+            for i in range(tracing.OTLP_MAX_BATCH):
+                exporter.export({"name": str(i)})
+            self.assertTrue(posted.wait(5))
+            exporter.shutdown()
+        self.assertEqual(tracing.OTLP_MAX_BATCH, len(post.call_args_list[0].args[0]))
+
+    def test_propagation(self):
+        server = api.GracefulHTTPServer(("localhost", 0), api.MainHTTPHandler)
+        self.addCleanup(server.server_close)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+
+        parent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        conn = http.client.HTTPConnection(*server.server_address)
+        conn.request(
+            "POST",
+            "/method",
+            body=json.dumps({"login": "h&f"}),
+            headers={"traceparent": parent, "X-Request-ID": "req-1"},
+        )
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        self.assertTrue(server.drain(1))
+
+        root = self.exporter.spans[-1]
+        self.assertEqual("POST /method", root["name"])
+        self.assertEqual("4bf92f3577b34da6a3ce929d0e0e4736", root["trace_id"])
+        self.assertEqual("00f067aa0ba902b7", root["parent_id"])
+        self.assertEqual("req-1", root["attributes"]["request_id"])
+        self.assertEqual(
+            tracing.format_traceparent(tracing.SpanContext(root["trace_id"], root["span_id"], True)),
+            response.getheader("traceparent"),
+        )
+
+
+class ScoreKeyTestSuite(unittest.TestCase):
+    def test_fields_are_not_concatenated(self):
+        self.assertNotEqual(
+            score_key(first_name="ab", last_name="c"),
+            score_key(first_name="a", last_name="bc"),
+        )
+
+    @cases(
+        [
+            {"email": "stupnikov@otus.ru"},
+            {"gender": 0},
+            {"gender": 1},
+            {"birthday": datetime.datetime(2000, 1, 1)},
+        ]
+    )
+    def test_all_inputs_change_key(self, arguments):
+        self.assertNotEqual(score_key(phone="79175002040"),
+                            score_key(phone="79175002040", **arguments))
+
+    def test_int_phone(self):
+        self.assertEqual(score_key(phone="79175002040"), score_key(phone=79175002040))
+
+    @cases([(True, 2), (False, 1)])
+    def test_legacy_score_keys(self, enabled, redis_sets):
+        store = Store()
+        store.connected, store._r = True, mock.Mock()
+        store._r.get.return_value = None
+        self.addCleanup(setattr, store, "connected", False)
+        self.addCleanup(setattr, store, "_r", None)
+        self.addCleanup(store.local_cache.clear)
+        with mock.patch.object(scoring, "WRITE_LEGACY_SCORE_KEYS", enabled):
+            scoring.get_score(store, phone=f"7917500204{redis_sets}")
+        self.assertEqual(redis_sets, store._r.set.call_count)
+
+    def test_key_format(self):
+        key = score_key(phone="79175002040", first_name="a", last_name="b")
+        self.assertTrue(key.startswith(SCORE_KEY_PREFIX))
+        self.assertEqual(len(SCORE_KEY_PREFIX) + 22, len(key))
+        self.assertEqual(key, score_key(phone="79175002040", first_name="a", last_name="b"))
+
+
+class HotKeysTestSuite(unittest.TestCase):
+    def test_top_keys(self):
+        hot_keys = HotKeys(capacity=3, share=0.2, min_count=5)
+        for i in range(100):
+            hot_keys.add("uid:hot")
+            hot_keys.add(f"uid:{i}")
+        top = hot_keys.top(1)
+        self.assertEqual("uid:hot", top[0]["key"])
+        self.assertTrue(hot_keys.is_hot("uid:hot"))
+        self.assertFalse(hot_keys.is_hot("uid:99"))
+        self.assertLessEqual(len(hot_keys.counts), 3)
+
+    def test_hot_interests_pinned_briefly(self):
+        store = Store()
+        hot_keys, store.hot_keys = store.hot_keys, HotKeys(share=0.5, min_count=2)
+        self.addCleanup(setattr, store, "hot_keys", hot_keys)
+        store.state, store._r = Store.CONNECTING, mock.Mock()
+        self.addCleanup(setattr, store, "state", Store.DISABLED)
+        self.addCleanup(setattr, store, "_r", None)
+        self.addCleanup(store.local_cache.clear)
+        store._r.mget.return_value = ['["cars"]']
+        for _ in range(3):
+            get_interests(store, [1])
+        _, expires_at = store.local_cache["i:1"]
+        self.assertLessEqual(expires_at, time.time() + HOT_INTERESTS_TTL)
+
+    def test_stream_summary_invariants(self):
+        hot_keys = HotKeys(capacity=10)
+        rnd = random.Random(42)
+        for _ in range(5000):
+            hot_keys.add(f"uid:{int(rnd.paretovariate(1.2))}")
+            self.assertEqual(min(hot_keys.counts.values()), hot_keys.min_bucket)
+        self.assertEqual(hot_keys.total, sum(hot_keys.counts.values()))
+        self.assertEqual(
+            sorted(hot_keys.counts),
+            sorted(key for bucket in hot_keys.buckets.values() for key in bucket),
+        )
+        self.assertEqual("uid:1", hot_keys.top(1)[0]["key"])
+
+    def test_new_hot_key_after_warm_up(self):
+        hot_keys = HotKeys(capacity=10, share=0.1, min_count=10, decay_every=1000)
+        for _ in range(100000):
+            hot_keys.add("uid:old")
+        hits = 0
+        while not hot_keys.is_hot("uid:new"):
+            hits += 1
+            hot_keys.add("uid:new")
+            hot_keys.add(f"uid:tail{hits}")
+            self.assertLess(hits, 500)
+        for i in range(5000):
+            hot_keys.add("uid:new")
+            hot_keys.add(f"uid:tail{i}")
+        self.assertEqual("uid:new", hot_keys.top(1)[0]["key"])
+        self.assertFalse(hot_keys.is_hot("uid:old"))
+        self.assertLessEqual(hot_keys.total, 2000)
+
+    def test_hot_key_pinned(self):
+        store = Store()
+        hot_keys, store.hot_keys = store.hot_keys, HotKeys(share=0.5, min_count=2)
+        self.addCleanup(setattr, store, "hot_keys", hot_keys)
+        for _ in range(3):
+            store.cache_get("uid:pinned")
+        store.connected = True
+        self.addCleanup(setattr, store, "connected", False)
+        store._r = mock.Mock()
+        self.addCleanup(setattr, store, "_r", None)
+        store.cache_set("uid:pinned", 1.5, 60)
+        _, expires_at = store.local_cache.pop("uid:pinned")
+        self.assertGreater(expires_at, time.time() + 60)
+        store._r.set.assert_called_once_with("uid:pinned", 1.5, ex=60)
+
+
+class StoreCacheTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.store = Store()
+        self.store.local_cache.clear()
+
+    def tearDown(self):
+        self.store.local_cache.clear()
+
+    def test_cache_snapshot_roundtrip(self):
+        self.store.cache_set("uid:fresh", 3.0, 60)
+        self.store.cache_set("uid:expired", 1.5, -1)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            self.store.save_cache(path)
+            self.store.local_cache.clear()
+            self.store.load_cache(path)
+        self.assertEqual(3.0, self.store.cache_get("uid:fresh"))
+        self.assertNotIn("uid:expired", self.store.local_cache)
+
+    def test_lazy_connection(self):
+        self.assertEqual(Store.DISABLED, self.store.state)
+        self.assertTrue(self.store.connect_done.is_set())
+        self.assertIsNone(self.store.get("i:1"))
+
+    def test_readiness(self):
+        response, code = api.readiness_handler(self.store)
+        self.assertEqual(api.OK, code)
+        self.assertEqual({"ready": True, "store": Store.DISABLED}, response)
+
+    @cases([Store.CONNECTING, Store.UNAVAILABLE])
+    def test_not_ready(self, state):
+        self.store.state = state
+        self.addCleanup(setattr, self.store, "state", Store.DISABLED)
+        response, code = api.readiness_handler(self.store)
+        self.assertEqual(api.SERVICE_UNAVAILABLE, code)
+        self.assertEqual({"ready": False, "store": state}, response)
+
+    def test_commands_while_connecting(self):
+        self.store.state, self.store._r = Store.CONNECTING, mock.Mock()
+        self.addCleanup(setattr, self.store, "state", Store.DISABLED)
+        self.addCleanup(setattr, self.store, "_r", None)
+        self.store._r.mget.return_value = ['["cars"]', None]
+        self.assertEqual({1: ["cars"]}, get_interests(self.store, [1, 2]))
+        self.store.cache_set("uid:1", 1.5, 60)
+        self.store._r.set.assert_called_once_with("uid:1", 1.5, ex=60)
+
+        self.store._r.get.side_effect = ConnectionError("not yet")
+        self.assertIsNone(self.store.get("uid:2"))
+
+        self.store.state = Store.UNAVAILABLE
+        self.assertIsNone(self.store.get("uid:3"))
+        self.assertEqual(1, self.store._r.get.call_count)
+
+    def test_local_cache_is_bounded(self):
+        self.store.local_cache_size = 3
+        self.addCleanup(setattr, self.store, "local_cache_size", LOCAL_CACHE_SIZE)
+        for i in range(10):
+            self.store.cache_set(f"uid:{i}", 1.5, 60)
+        self.assertEqual(["uid:7", "uid:8", "uid:9"], list(self.store.local_cache))
+        self.store.cache_get("uid:7")
+        self.store.cache_set("uid:10", 1.5, 60)
+        self.assertEqual(["uid:9", "uid:7", "uid:10"], list(self.store.local_cache))
+
+    def test_load_missing_snapshot(self):
+        self.store.load_cache(os.path.join(tempfile.gettempdir(), "missing.json"))
+        self.assertEqual({}, self.store.local_cache)
+
+
+class SlowHandler(api.MainHTTPHandler):
+    def do_GET(self):
+        time.sleep(0.3)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GracefulServerTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.server = api.GracefulHTTPServer(("localhost", 0), SlowHandler)
+
+    def tearDown(self):
+        self.server.server_close()
+
+    def test_drain_idle(self):
+        self.assertTrue(self.server.drain(0))
+
+    def test_drain_waits_for_in_flight(self):
+        self.server.in_flight = 1
+        self.assertFalse(self.server.drain(0.01))
+
+        def finish():
+            with self.server.idle:
+                self.server.in_flight = 0
+                self.server.idle.notify_all()
+
+        threading.Timer(0.01, finish).start()
+        self.assertTrue(self.server.drain(1))
+
+    def serve_with_request(self, signum, cache_snapshot=None):
+        """Run api.serve, sending `signum` while a slow request is in flight."""
+        for s in (signal.SIGTERM, getattr(signal, "SIGHUP", signal.SIGTERM)):
+            self.addCleanup(signal.signal, s, signal.getsignal(s))
+        statuses = []
+
+        def request():
+            conn = http.client.HTTPConnection(*self.server.server_address)
+            conn.request("GET", "/ready")
+            statuses.append(conn.getresponse().status)
+            conn.close()
+
+        def send_signal():
+            deadline = time.time() + 5
+            while self.server.in_flight == 0 and time.time() < deadline:
+                time.sleep(0.01)
+            os.kill(os.getpid(), signum)
+
+        client = threading.Thread(target=request)
+        client.start()
+        threading.Thread(target=send_signal).start()
+        api.serve(self.server, Store(), 5, cache_snapshot)
+        in_flight = self.server.in_flight
+        client.join(5)
+        return in_flight, statuses
+
+    def test_sigterm_drains_in_flight_request(self):
+        in_flight, statuses = self.serve_with_request(signal.SIGTERM)
+        self.assertEqual(0, in_flight)
+        self.assertEqual([api.OK], statuses)
+
+    @unittest.skipUnless(hasattr(signal, "SIGHUP"), "SIGHUP is not available")
+    def test_sighup_hands_over_after_drain(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            with mock.patch.object(api, "spawn", return_value=True) as spawn:
+                in_flight, statuses = self.serve_with_request(signal.SIGHUP, path)
+            self.assertTrue(os.path.exists(path))
+        spawn.assert_called_once_with(self.server)
+        self.assertEqual(0, in_flight)
+        self.assertEqual([api.OK], statuses)
+
+    @unittest.skipUnless(hasattr(signal, "SIGHUP"), "SIGHUP is not available")
+    def test_sighup_keeps_serving_when_spawn_fails(self):
+        def spawn(server):
+            # Still accepting after the failed handover, stop with SIGTERM
+            threading.Timer(0.2, os.kill, (os.getpid(), signal.SIGTERM)).start()
+            return False
+
+        with mock.patch.object(api, "spawn", side_effect=spawn) as spawn_mock:
+            in_flight, statuses = self.serve_with_request(signal.SIGHUP)
+        spawn_mock.assert_called_once_with(self.server)
+        self.assertEqual(0, in_flight)
+        self.assertEqual([api.OK], statuses)
 
 if __name__ == "__main__":
     unittest.main()
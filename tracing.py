@@ -0,0 +1,282 @@
+import contextvars
+import functools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+OTLP_FLUSH_INTERVAL = 5.0
+OTLP_MAX_BATCH = 512
+OTLP_MAX_QUEUE = 8192
+OTLP_SHUTDOWN_TIMEOUT = 5.0
+
+SpanContext = namedtuple("SpanContext", ["trace_id", "span_id", "sampled"])
+
+_current = contextvars.ContextVar("current_span", default=None)
+_tracer = None
+
+
+def parse_traceparent(header):
+    """Parent span context from a W3C traceparent header, or None."""
+    match = TRACEPARENT_RE.match((header or "").strip().lower())
+    if not match:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def format_traceparent(context):
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+class NoopSpan:
+    context = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Span:
+    def __init__(self, tracer, name, context, parent_id, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.token = None
+        self.start = 0
+
+    def __enter__(self):
+        self.token = _current.set(self.context)
+        self.start = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        if self.context.sampled:
+            self.tracer.exporter.export({
+                "name": self.name,
+                "trace_id": self.context.trace_id,
+                "span_id": self.context.span_id,
+                "parent_id": self.parent_id,
+                "start": self.start,
+                "end": time.time_ns(),
+                "attributes": self.attributes,
+                "error": None if exc is None else repr(exc),
+            })
+        return False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class Tracer:
+    def __init__(self, exporter, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def span(self, name, parent=None, attributes=None):
+        parent = parent or _current.get()
+        if parent is None:
+            trace_id = f"{random.getrandbits(128):032x}"
+            sampled = random.random() < self.sample_rate
+            parent_id = None
+        else:
+            trace_id, parent_id, sampled = parent
+        context = SpanContext(trace_id, f"{random.getrandbits(64):016x}", sampled)
+        return Span(self, name, context, parent_id, attributes or {})
+
+
+def configure(exporter, sample_rate: float = 1.0):
+    global _tracer
+    _tracer = Tracer(exporter, sample_rate) if exporter is not None else None
+
+
+def shutdown():
+    global _tracer
+    if _tracer is not None:
+        _tracer.exporter.shutdown()
+    _tracer = None
+
+
+def span(name, parent=None, **attributes):
+    tracer = _tracer
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.span(name, parent, attributes)
+
+
+def traced(name):
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return f(*args, **kwargs)
+            with tracer.span(name):
+                return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class InMemoryExporter:
+    def __init__(self):
+        self.spans: list = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def shutdown(self):
+        pass
+
+
+class FileExporter:
+    """Writes finished spans to a file as JSON lines."""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, "a", buffering=1)
+
+    def export(self, span):
+        line = json.dumps(span)
+        with self.lock:
+            # Requests still running after shutdown must not fail on a closed file
+            if not self.file.closed:
+                self.file.write(line + "\n")
+
+    def shutdown(self):
+        with self.lock:
+            self.file.close()
+
+
+class OTLPExporter:
+    """Sends spans in batches to an OTLP/HTTP JSON endpoint (/v1/traces).
+
+    A single background thread posts the spans. Spans that arrive while
+    `max_queue` spans are already waiting are dropped.
+    """
+
+    def __init__(
+            self,
+            endpoint,
+            service_name="api",
+            flush_interval=OTLP_FLUSH_INTERVAL,
+            max_queue=OTLP_MAX_QUEUE
+    ):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.spans: list = []
+        self.dropped = 0
+        self.full = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def export(self, span):
+        if self.stopped.is_set():
+            return
+        with self.lock:
+            if len(self.spans) >= self.max_queue:
+                self.dropped += 1
+                return
+            self.spans.append(span)
+            full = len(self.spans) >= OTLP_MAX_BATCH
+        if full:
+            self.full.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.full.wait(self.flush_interval)
+            self.full.clear()
+            if self.stopped.is_set():
+                # shutdown() does the last flush under its deadline
+                break
+            self.flush()
+
+    def flush(self, deadline=None):
+        with self.lock:
+            spans, self.spans = self.spans, []
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logging.error("Dropped %s spans, export queue is full" % dropped)
+        for start in range(0, len(spans), OTLP_MAX_BATCH):
+            timeout = self.flush_interval
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    logging.error("Dropped %s spans, export deadline passed" % (len(spans) - start))
+                    return
+            self.post(spans[start:start + OTLP_MAX_BATCH], timeout)
+
+    def post(self, spans, timeout):
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(self.payload(spans)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            urllib.request.urlopen(request, timeout=timeout).close()
+        except Exception as e:
+            logging.error("Failed to export %s spans: %s" % (len(spans), e))
+
+    def payload(self, spans):
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}},
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "tracing"},
+                    "spans": [self.otlp_span(span) for span in spans],
+                }],
+            }]
+        }
+
+    @staticmethod
+    def otlp_span(span):
+        otlp = {
+            "traceId": span["trace_id"],
+            "spanId": span["span_id"],
+            "name": span["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(span["start"]),
+            "endTimeUnixNano": str(span["end"]),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in span["attributes"].items()
+            ],
+            "status": {"code": 2, "message": span["error"]} if span["error"] else {},
+        }
+        if span["parent_id"]:
+            otlp["parentSpanId"] = span["parent_id"]
+        return otlp
+
+    def shutdown(self, timeout=OTLP_SHUTDOWN_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        self.stopped.set()
+        self.full.set()
+        self.thread.join(timeout)
+        self.flush(deadline)